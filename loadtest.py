@@ -0,0 +1,467 @@
+"""Concurrent load test for the medic bot's slash commands.
+
+Drives the real /report, /leaderboard and /medicstats callbacks from
+medic_bot.py with fake Discord interactions against an in-memory sheet
+backend with configurable latency, then reports per scenario:
+
+  * p50 / p99 latency per command
+  * time the event loop was blocked
+  * reports lost or duplicated in the raw log
+  * Sheets API calls, by method
+
+Targets discord.py 2.7 / gspread 6.2. Modal fields and the job select are
+filled through discord.py private attributes, so other versions are refused:
+    pip install "discord.py==2.7.1" "gspread==6.2.1" python-dotenv
+
+Usage:
+    python loadtest.py --users 50 --latency 0.2
+    python loadtest.py --scenario duplicates --users 20
+    python loadtest.py --quota 60        # enforce the real per-minute quota
+"""
+import io
+import re
+import time
+import random
+import asyncio
+import argparse
+import threading
+import contextlib
+from types import SimpleNamespace
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from unittest import mock
+
+import discord
+from google.auth.credentials import AnonymousCredentials
+
+# fill() and select._values below rely on discord.py internals of this release
+DISCORD_PY_VERSION = "2.7"
+if not discord.__version__.startswith(DISCORD_PY_VERSION + "."):
+    raise SystemExit(
+        f"loadtest.py targets discord.py {DISCORD_PY_VERSION}.x, found {discord.__version__}"
+    )
+
+# medic_bot authenticates at import; no real service account is needed here
+with mock.patch(
+    "google.oauth2.service_account.Credentials.from_service_account_file",
+    return_value=AnonymousCredentials(),
+):
+    import medic_bot
+
+
+# ================= SIMULATED SHEETS BACKEND =================
+class FakeBackend:
+    """Every spreadsheet the fake client can open, plus call accounting."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.spreadsheets = {}
+
+    def request(self, method: str):
+        """Count one API call and block like a real HTTP round trip would."""
+        with self.lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def open_by_key(self, key):
+        self.request("open_by_key")
+        with self.lock:
+            if key not in self.spreadsheets:
+                self.spreadsheets[key] = FakeSpreadsheet(self)
+            return self.spreadsheets[key]
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.sheets = [FakeWorksheet(backend, "Sheet1")]
+
+    def get_worksheet(self, index):
+        self.backend.request("get_worksheet")
+        return self.sheets[index]
+
+    def worksheet(self, title):
+        self.backend.request("worksheet")
+        for ws in self.sheets:
+            if ws.title == title:
+                return ws
+        raise medic_bot.gspread.exceptions.WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        self.backend.request("add_worksheet")
+        ws = FakeWorksheet(self.backend, title)
+        self.sheets.append(ws)
+        return ws
+
+
+class FakeWorksheet:
+    def __init__(self, backend: FakeBackend, title: str):
+        self.backend = backend
+        self.title = title
+        self.rows = []
+        self.lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return max(len(self.rows), 1000)
+
+    def row_values(self, row):
+        self.backend.request("row_values")
+        with self.lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def get(self, range_name, value_render_option=None):
+        """Row ranges ('2:501') or single-column ranges ('J2:J501')."""
+        self.backend.request("get")
+        first, last = range_name.split(":")
+        col = None
+        if first[0].isalpha():
+            col = medic_bot.gspread.utils.a1_to_rowcol(first)[1] - 1
+        start, end = (int(re.sub(r"[A-Z]", "", x)) for x in (first, last))
+        formulas = value_render_option == medic_bot.gspread.utils.ValueRenderOption.formula
+        with self.lock:
+            rows = [
+                [cell if formulas else render(cell) for cell in r]
+                for r in self.rows[start - 1:end]
+            ]
+        if col is not None:
+            rows = [[r[col]] if col < len(r) else [] for r in rows]
+        return rows
+
+    def get_all_records(self):
+        self.backend.request("get_all_records")
+        with self.lock:
+            if not self.rows:
+                return []
+            header = self.rows[0]
+            return [
+                dict(zip(header, list(r) + [""] * (len(header) - len(r))))
+                for r in self.rows[1:]
+            ]
+
+    def append_row(self, values, value_input_option=None):
+        self.backend.request("append_row")
+        with self.lock:
+            self.rows.append(list(values))
+
+    def update(self, values, range_name=None):
+        self.backend.request("update")
+        with self.lock:
+            for i, row in enumerate(values):
+                if i < len(self.rows):
+                    self.rows[i] = list(row)
+                else:
+                    self.rows.append(list(row))
+
+    def update_cell(self, row, col, value):
+        self.backend.request("update_cell")
+        with self.lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            cells.extend([""] * (col - len(cells)))
+            cells[col - 1] = value
+
+    def batch_clear(self, ranges):
+        """Only the 'A<row>:<col>' trailing-rows form medic_bot uses."""
+        self.backend.request("batch_clear")
+        with self.lock:
+            for range_name in ranges:
+                first_row = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+                del self.rows[first_row - 1:]
+
+    def clear(self):
+        self.backend.request("clear")
+        with self.lock:
+            self.rows = []
+
+
+def render(cell):
+    """Formatted value of a cell: =HYPERLINK(url, label) shows only its label."""
+    match = re.match(r'=HYPERLINK\("[^"]*",\s*"([^"]*)"\)', str(cell))
+    return match.group(1) if match else cell
+
+
+# ================= FAKE DISCORD INTERACTIONS =================
+class FakeChannel:
+    def __init__(self, channel_id: int, discord_latency: float):
+        self.id = channel_id
+        self.discord_latency = discord_latency
+        self.posts = 0
+        self._ids = iter(range(10**6, 10**7))
+
+    async def send(self, content=None, *, embed=None):
+        await asyncio.sleep(self.discord_latency)
+        self.posts += 1
+        return SimpleNamespace(id=next(self._ids))
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await asyncio.sleep(self.interaction.discord_latency)
+
+    async def send_message(self, content=None, *, embed=None, view=None, ephemeral=False):
+        await asyncio.sleep(self.interaction.discord_latency)
+        self.interaction.messages.append(content)
+        self.interaction.view = view
+
+    async def send_modal(self, modal):
+        await asyncio.sleep(self.interaction.discord_latency)
+        self.interaction.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, *, embed=None, file=None, ephemeral=False):
+        await asyncio.sleep(self.interaction.discord_latency)
+        self.interaction.messages.append(content if content is not None else embed.title)
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the bot's command handlers."""
+
+    def __init__(self, guild_id: int, channel: FakeChannel, discord_latency: float):
+        self.guild_id = guild_id
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = channel
+        self.discord_latency = discord_latency
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.messages = []
+        self.view = None
+        self.modal = None
+
+    @property
+    def last_message(self):
+        return self.messages[-1] if self.messages else ""
+
+
+def fill(text_input, value: str):
+    """Set a modal field as if the user had typed into it."""
+    text_input._value = value
+
+
+# ================= SCENARIO RUNNER =================
+HISTORY_MEDICS = [f"Medic {c}" for c in "ABCDEFGHIJKLMNOPQRST"]
+JOB_TYPES = ["Raid / Defend", "LMPF", "Healing Lowbies", "Escort", "World Boss", "Arc"]
+RAW_HEADER = [
+    "Timestamp", "Medics", "Job Name", "Duration", "Points", "Clients",
+    "Participant Names", "Description", "Report Date", "Message Link", "Time Range",
+]
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.tenant = next(iter(medic_bot.TENANTS.values()))
+        self.guild = discord.Object(id=self.tenant.guild_id)
+        self.channel = FakeChannel(medic_bot.CHANNEL_ID, args.discord_latency)
+
+    def interaction(self):
+        return FakeInteraction(self.tenant.guild_id, self.channel, self.args.discord_latency)
+
+    def command(self, name):
+        return medic_bot.tree.get_command(name, guild=self.guild)
+
+    def reset(self):
+        """Fresh backend seeded with history, fresh caches, zeroed counters."""
+        self.backend = FakeBackend(self.args.latency, self.args.jitter)
+        medic_bot.GC = self.backend
+        medic_bot.QUOTA = medic_bot.SheetsQuota(self.args.quota)
+        # asyncio.Lock binds to one event loop; each scenario runs in a new one
+        self.tenant.lock = asyncio.Lock()
+        self.tenant.invalidate()
+
+        today = datetime.now()
+        rows = [RAW_HEADER]
+        for i in range(self.args.history):
+            medics = random.sample(HISTORY_MEDICS, 2)
+            day = today.replace(day=1) + timedelta(days=i % max(today.day, 1))
+            start = datetime.combine(day.date(), datetime.min.time()) + timedelta(minutes=15 * i)
+            end = start + timedelta(minutes=60)
+            rows.append([
+                day.strftime("%m/%d/%Y %H:%M"), ", ".join(medics), random.choice(JOB_TYPES),
+                "60 min", 10, 2, "x, y", f"history-{i}", start.strftime("%m/%d/%Y"),
+                "View Report", medic_bot.format_time_range(start, end),
+            ])
+        raw = self.backend.open_by_key(self.tenant.spreadsheet_id).sheets[0]
+        raw.rows = rows
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            medic_bot.update_master_log(self.tenant)
+        self.tenant.invalidate()
+        self.backend.calls.clear()
+
+    def raw_rows(self):
+        """Raw log rows as dicts keyed by the sheet's own header."""
+        header, *rows = self.backend.spreadsheets[self.tenant.spreadsheet_id].sheets[0].rows
+        return [dict(zip(header, row)) for row in rows]
+
+    # ---------- one simulated user per coroutine ----------
+    async def do_leaderboard(self):
+        inter = self.interaction()
+        await self.command("leaderboard").callback(inter)
+        return inter.last_message
+
+    async def do_medicstats(self):
+        inter = self.interaction()
+        await self.command("medicstats").callback(inter, random.choice(HISTORY_MEDICS))
+        return inter.last_message
+
+    async def do_report(self, medics, job_type, start: datetime, tag: str):
+        end = start + timedelta(minutes=45)
+        inter = self.interaction()
+        await self.command("report").callback(inter)
+
+        select = inter.view.children[0]
+        select._values = [job_type]
+        select_inter = self.interaction()
+        await select.callback(select_inter)
+
+        modal = select_inter.modal
+        fill(modal.medics, ", ".join(medics))
+        fill(modal.date, start.strftime("%m/%d/%Y"))
+        fill(modal.time_range, f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}")
+        fill(modal.clients, "Client One, Client Two")
+        fill(modal.description, tag)
+        modal_inter = self.interaction()
+        await modal.on_submit(modal_inter)
+        return modal_inter.last_message
+
+    # ---------- scenarios ----------
+    def plan(self, scenario: str):
+        """List of (command, coroutine factory, report tag or None) per user."""
+        day = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(hours=9)
+        ops = []
+        for i in range(self.args.users):
+            tag = f"loadtest-{scenario}-{i}"
+            unique = ([f"Load Medic {i}"], random.choice(JOB_TYPES), day, tag)
+            if scenario == "reports":
+                kind = "report"
+            elif scenario == "duplicates":
+                # Everyone submits the same shared job → exactly one row expected
+                unique = (["Load Medic A", "Load Medic B"], "Escort", day, tag)
+                kind = "report"
+            elif scenario == "reads":
+                kind = random.choice(["leaderboard", "medicstats"])
+            else:
+                kind = random.choice(["report", "leaderboard", "medicstats"])
+
+            if kind == "report":
+                ops.append((kind, lambda args=unique: self.do_report(*args), tag))
+            elif kind == "leaderboard":
+                ops.append((kind, self.do_leaderboard, None))
+            else:
+                ops.append((kind, self.do_medicstats, None))
+        return ops
+
+    async def run(self, scenario: str):
+        self.reset()
+        ops = self.plan(scenario)
+        latencies = defaultdict(list)
+        outcomes = Counter()
+        logged_tags = []
+        blocked = {"total": 0.0, "max": 0.0}
+
+        async def watch_loop(interval=0.01):
+            while True:
+                t0 = time.perf_counter()
+                await asyncio.sleep(interval)
+                lag = time.perf_counter() - t0 - interval
+                if lag > 0.002:
+                    blocked["total"] += lag
+                    blocked["max"] = max(blocked["max"], lag)
+
+        async def user(kind, factory, tag):
+            t0 = time.perf_counter()
+            message = await factory()
+            latencies[kind].append(time.perf_counter() - t0)
+            if message.startswith("⚠️ Possible duplicate"):
+                outcomes["rejected duplicate"] += 1
+            elif message.startswith("⚠️"):
+                outcomes["error"] += 1
+            if kind == "report" and message.startswith("✅"):
+                logged_tags.append(tag)
+
+        watcher = asyncio.create_task(watch_loop())
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(user(*op) for op in ops))
+        wall = time.perf_counter() - started
+        watcher.cancel()
+
+        rows_by_tag = Counter(row.get("Description") for row in self.raw_rows())
+        lost = [tag for tag in logged_tags if rows_by_tag[tag] == 0]
+        duplicated = sum(n - 1 for tag, n in rows_by_tag.items() if n > 1)
+        fingerprints = Counter(
+            (row.get("Medics"), row.get("Job Name"), row.get("Report Date"), row.get("Time Range"))
+            for row in self.raw_rows()
+            if row.get("Time Range")
+        )
+        same_job = sum(n - 1 for n in fingerprints.values() if n > 1)
+
+        self.print_report(scenario, wall, latencies, blocked, outcomes,
+                          logged_tags, lost, duplicated, same_job)
+
+    def print_report(self, scenario, wall, latencies, blocked, outcomes,
+                     logged_tags, lost, duplicated, same_job):
+        print(f"\n=== {scenario}: {self.args.users} users, "
+              f"{self.args.latency * 1000:.0f} ms sheet latency — {wall:.2f}s wall ===")
+        for kind, values in sorted(latencies.items()):
+            print(f"  /{kind:<12} n={len(values):<4} "
+                  f"p50={percentile(values, 50) * 1000:8.1f} ms  "
+                  f"p99={percentile(values, 99) * 1000:8.1f} ms")
+        print(f"  event loop blocked: {blocked['total'] * 1000:.1f} ms total, "
+              f"{blocked['max'] * 1000:.1f} ms worst stall")
+        print(f"  reports logged: {len(logged_tags)}, lost rows: {len(lost)}, "
+              f"duplicated rows: {duplicated}, same-job rows: {same_job}")
+        print(f"  outcomes: rejected duplicates={outcomes['rejected duplicate']}, "
+              f"errors={outcomes['error']}")
+        calls = self.backend.calls
+        detail = ", ".join(f"{name}={n}" for name, n in calls.most_common())
+        print(f"  sheets calls: {sum(calls.values())} ({detail})")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+SCENARIOS = ("reports", "reads", "mixed", "duplicates")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the medic bot's slash commands")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent users per scenario")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per Sheets call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="± fraction of latency")
+    parser.add_argument("--discord-latency", type=float, default=0.05,
+                        help="Seconds per Discord API call")
+    parser.add_argument("--history", type=int, default=200, help="Raw-log rows seeded first")
+    parser.add_argument("--quota", type=int, default=100000,
+                        help="Sheets requests/min (60 = Google's real per-user limit)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    harness = Harness(args)
+    for scenario in (SCENARIOS if args.scenario == "all" else (args.scenario,)):
+        asyncio.run(harness.run(scenario))
+
+
+if __name__ == "__main__":
+    main()
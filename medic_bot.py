@@ -1,13 +1,24 @@
 import discord
 import re
+import bisect
 import gspread
 import os
+import csv
 import json
+import time
+import argparse
+import tempfile
+import asyncio
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from typing import Literal
 
 # ================= CONFIG =================
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
@@ -15,6 +26,22 @@ CHANNEL_ID = 1439473833273856120                   # text channel if needed
 SPREADSHEET_ID = "1aXhvKbXqXlHEu94dQctSJP8jk6tLvNWkrYHZyDYcI0c"
 GUILD_ID = 861362652710174740                   # your real server (guild) ID
 
+# Optional list of every division this process serves. Without it the bot
+# serves only the single division configured above. Example tenants.json:
+# [
+#   {"guild_id": 861362652710174740, "spreadsheet_id": "1aXh...", "name": "Leaf"},
+#   {"guild_id": 123456789012345678, "spreadsheet_id": "1bYi...", "name": "Sand",
+#    "master_title": "Sand Master Medical Log", "bank_ryo": 15000}
+# ]
+TENANTS_FILE = os.getenv("MEDBOT_TENANTS_FILE", "tenants.json")
+
+# Sheets API budget shared by ALL tenants (Google allows 60 requests/min per user)
+SHEETS_REQUESTS_PER_MINUTE = int(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+SHEETS_POOL_SIZE = int(os.getenv("SHEETS_POOL_SIZE", "32"))
+SHEETS_WORKERS = int(os.getenv("SHEETS_WORKERS", str(SHEETS_POOL_SIZE)))
+# Officers edit ranks in the Master Log by hand; re-read it at least this often
+MASTER_CACHE_SECONDS = int(os.getenv("MASTER_CACHE_SECONDS", "60"))
+
 # Google Sheets auth
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
@@ -24,17 +51,229 @@ CREDS = Credentials.from_service_account_file(
     scopes=SCOPES
 )
 
+# One authorized client for every tenant. Widen its connection pool so
+# concurrent rebuilds don't queue behind urllib3's default of 10 connections.
 GC = gspread.authorize(CREDS)
-SHEET = GC.open_by_key(SPREADSHEET_ID).sheet1  # first worksheet with raw logs
+GC.http_client.session.mount(
+    "https://",
+    HTTPAdapter(pool_connections=SHEETS_POOL_SIZE, pool_maxsize=SHEETS_POOL_SIZE),
+)
 
 # Expected header row in the first sheet:
-# Timestamp | Medics | Job Name | Duration | Points | Clients | Participant Names | Description | Report Date | Message Link
+# Timestamp | Medics | Job Name | Duration | Points | Clients | Participant Names | Description | Report Date | Message Link | Time Range
+# Reports are written by header name, so column order may differ.
+RAW_LOG_COLUMNS = [
+    "Timestamp", "Medics", "Job Name", "Duration", "Points", "Clients",
+    "Participant Names", "Description", "Report Date", "Message Link", "Time Range",
+]
+
+
+# ================= SHEETS QUOTA =================
+class SheetsQuota:
+    """Token bucket shared by every tenant, handed out round-robin.
+
+    Each Sheets request takes one token. When tokens run short, tenants with
+    waiting requests are served in turn, so one division's full rebuild can't
+    starve the others of quota.
+    """
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+        self.waiting = OrderedDict()  # tenant key -> waiting requests, in serving order
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, key):
+        """Block until `key` may send one request."""
+        with self.cond:
+            self.waiting[key] = self.waiting.get(key, 0) + 1
+            while True:
+                self._refill()
+                if self.tokens >= 1 and next(iter(self.waiting)) == key:
+                    self.tokens -= 1
+                    # Served → go to the back of the line if more requests wait
+                    remaining = self.waiting.pop(key) - 1
+                    if remaining:
+                        self.waiting[key] = remaining
+                    self.cond.notify_all()
+                    return
+                # Out of tokens → sleep until one refills; otherwise wait our turn
+                self.cond.wait((1 - self.tokens) / self.rate if self.tokens < 1 else None)
+
+
+QUOTA = SheetsQuota(SHEETS_REQUESTS_PER_MINUTE)
+
+
+# ================= TENANTS =================
+class Tenant:
+    """One medical division: its guild, its spreadsheet and cached sheet state."""
+
+    def __init__(self, guild_id, spreadsheet_id, channel_id=None, name=None,
+                 master_title="Leaf Master Medical Log", bank_ryo=20000):
+        self.guild_id = int(guild_id)
+        self.spreadsheet_id = spreadsheet_id
+        self.channel_id = channel_id
+        self.name = name or str(guild_id)
+        self.master_title = master_title
+        self.bank_ryo = bank_ryo
+
+        # Held (on the event loop) while this tenant's sheets are read/rebuilt
+        # so two reports in the same division don't interleave clear()/update()
+        # calls. Waiting here costs no worker thread.
+        self.lock = asyncio.Lock()
+
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._records = None
+        self._raw_header = None
+        self._master_records = None
+        self._master_loaded = 0.0
+        self._report_index = None
+
+    def call(self, fn, *args, **kwargs):
+        """Make one Sheets request against the shared quota."""
+        QUOTA.acquire(self.guild_id)
+        return fn(*args, **kwargs)
+
+    @property
+    def spreadsheet(self):
+        if self._spreadsheet is None:
+            self._spreadsheet = self.call(GC.open_by_key, self.spreadsheet_id)
+        return self._spreadsheet
+
+    @property
+    def raw_log(self):
+        """First worksheet, holding the raw report rows."""
+        if 0 not in self._worksheets:
+            self._worksheets[0] = self.call(self.spreadsheet.get_worksheet, 0)
+        return self._worksheets[0]
+
+    def worksheet(self, title):
+        """Open a worksheet by title; raises gspread WorksheetNotFound."""
+        if title not in self._worksheets:
+            self._worksheets[title] = self.call(self.spreadsheet.worksheet, title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        ws = self.call(self.spreadsheet.add_worksheet, title=title, rows=rows, cols=cols)
+        self._worksheets[title] = ws
+        return ws
+
+    def records(self):
+        """Raw log rows, cached until a report is appended or caches are cleared."""
+        if self._records is None:
+            self._records = self.call(self.raw_log.get_all_records)
+        return self._records
+
+    def master_records(self, fresh=False):
+        """Master log rows, cached for MASTER_CACHE_SECONDS (or re-read if `fresh`)."""
+        expired = time.monotonic() - self._master_loaded > MASTER_CACHE_SECONDS
+        if fresh or expired or self._master_records is None:
+            master = self.worksheet(self.master_title)
+            self.set_master_records(self.call(master.get_all_records))
+        return self._master_records
+
+    def set_master_records(self, records):
+        self._master_records = records
+        self._master_loaded = time.monotonic()
+
+    def raw_header(self):
+        """Raw log header row, checked against RAW_LOG_COLUMNS."""
+        if self._raw_header is None:
+            header = self.call(self.raw_log.row_values, 1)
+            if "Time Range" not in header:
+                # Older sheets predate the column; add its header once
+                self.call(self.raw_log.update_cell, 1, len(header) + 1, "Time Range")
+                header = header + ["Time Range"]
+                self._records = None
+            missing = [col for col in RAW_LOG_COLUMNS if col not in header]
+            if missing:
+                raise ValueError(f"Raw log header is missing: {', '.join(missing)}")
+            self._raw_header = header
+        return self._raw_header
+
+    def report_index(self):
+        """Duplicate-report index, built from the raw log on first use."""
+        if self._report_index is None:
+            self.raw_header()
+            self._report_index = ReportIndex.from_records(self.records())
+        return self._report_index
+
+    def append_report(self, values: dict):
+        """Append one report, placing each value under its header column."""
+        row = [values.get(col, "") for col in self.raw_header()]
+        self.call(self.raw_log.append_row, row, value_input_option="USER_ENTERED")
+        self._records = None
+
+    def invalidate(self):
+        """Forget everything cached, e.g. after the sheet was edited by hand."""
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._records = None
+        self._raw_header = None
+        self._master_records = None
+        self._report_index = None
+
+
+def load_tenants(path: str) -> dict:
+    """Build the guild ID → Tenant registry from the tenants file."""
+    if os.path.exists(path):
+        with open(path) as f:
+            entries = json.load(f)
+    else:
+        entries = [{
+            "guild_id": GUILD_ID,
+            "spreadsheet_id": SPREADSHEET_ID,
+            "channel_id": CHANNEL_ID,
+        }]
+    tenants = {}
+    for entry in entries:
+        tenant = Tenant(**entry)
+        tenants[tenant.guild_id] = tenant
+    return tenants
+
+
+TENANTS = load_tenants(TENANTS_FILE)
+TENANT_GUILDS = [discord.Object(id=guild_id) for guild_id in TENANTS]
+
+
+def tenant_for(interaction: discord.Interaction):
+    """Look up the division an interaction came from (None if unconfigured)."""
+    return TENANTS.get(interaction.guild_id)
+
+
+# Own executor for sheet work, sized to the HTTP pool, so it never competes
+# with asyncio's default executor.
+SHEETS_EXECUTOR = ThreadPoolExecutor(max_workers=SHEETS_WORKERS, thread_name_prefix="sheets")
+
+
+async def run_sheets(fn, *args):
+    """Run blocking sheet work on the Sheets executor, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(SHEETS_EXECUTOR, functools.partial(fn, *args))
+
+
+async def run_for_tenant(tenant: Tenant, fn, *args):
+    """Run sheet work for one tenant, one job per tenant at a time.
+
+    The lock is taken before dispatching, so a burst of jobs for one division
+    occupies at most one worker thread and can't starve other divisions.
+    """
+    async with tenant.lock:
+        return await run_sheets(fn, tenant, *args)
 
 
 # ================= NAME NORMALIZATION =================
-def load_medic_normalization():
+def load_medic_normalization(tenant: Tenant):
     """Reads all medic names from the sheet & builds a normalization map."""
-    records = SHEET.get_all_records()
+    records = tenant.records()
     mapping = {}
 
     for row in records:
@@ -58,6 +297,113 @@ def normalize_medic_name(name: str, mapping: dict) -> str:
         return proper
 
 
+# ================= DUPLICATE DETECTION =================
+class ReportIndex:
+    """Fingerprints and per-medic time spans of every logged report.
+
+    Built once from the raw log and then kept current as reports come in, so
+    a new report is checked with a set lookup plus one bisect per medic
+    instead of rescanning the sheet.
+    """
+
+    def __init__(self):
+        self.fingerprints = set()
+        self.spans = defaultdict(list)  # medic (lowercase) -> sorted [(start, end)]
+        # medic -> running max over spans[:k+1] as (end, start), so nested or
+        # overlapping history spans are still caught
+        self.max_end = defaultdict(list)
+
+    @staticmethod
+    def fingerprint(medics, job_type: str, start: datetime, end: datetime):
+        """Same medics (any order/case), date, start/end time and job type."""
+        return (
+            frozenset(m.strip().lower() for m in medics),
+            start.date(),
+            start.time(),
+            end.time(),
+            job_type.strip().lower(),
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for row in records:
+            span = parse_time_range(
+                str(row.get("Time Range", "")), str(row.get("Report Date", ""))
+            )
+            if span is None:
+                continue  # rows logged before times were recorded
+            medics = [m.strip() for m in str(row.get("Medics", "")).split(",") if m.strip()]
+            index.add(medics, str(row.get("Job Name", "")), *span)
+        return index
+
+    def conflict(self, medics, job_type: str, start: datetime, end: datetime):
+        """Explain why this report looks already logged, or None."""
+        if self.fingerprint(medics, job_type, start, end) in self.fingerprints:
+            return "This job was already reported."
+
+        for medic in medics:
+            key = medic.strip().lower()
+            spans = self.spans.get(key, [])
+            # Spans starting before this one ends; overlap if any ends after it starts
+            i = bisect.bisect_left(spans, (end,))
+            if i and self.max_end[key][i - 1][0] > start:
+                prev_end, prev_start = self.max_end[key][i - 1]
+                return (
+                    f"{medic} already has a report for "
+                    f"{prev_start.strftime('%m/%d/%Y %H:%M')}–{prev_end.strftime('%H:%M')}."
+                )
+        return None
+
+    def add(self, medics, job_type: str, start: datetime, end: datetime):
+        self.fingerprints.add(self.fingerprint(medics, job_type, start, end))
+        for medic in medics:
+            key = medic.strip().lower()
+            i = bisect.bisect_left(self.spans[key], (start, end))
+            self.spans[key].insert(i, (start, end))
+            self._refresh_max_end(key, i)
+
+    def remove(self, medics, job_type: str, start: datetime, end: datetime):
+        """Undo add() for a report that failed to log."""
+        self.fingerprints.discard(self.fingerprint(medics, job_type, start, end))
+        for medic in medics:
+            key = medic.strip().lower()
+            spans = self.spans.get(key, [])
+            if (start, end) in spans:
+                i = spans.index((start, end))
+                del spans[i]
+                self._refresh_max_end(key, i)
+
+    def _refresh_max_end(self, key, i: int):
+        """Recompute the running max end from position i onward."""
+        spans = self.spans[key]
+        max_end = self.max_end[key]
+        del max_end[i:]
+        for start, end in spans[i:]:
+            max_end.append(max(max_end[-1], (end, start)) if max_end else (end, start))
+
+
+def format_time_range(start: datetime, end: datetime) -> str:
+    return f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}"
+
+
+def parse_time_range(time_range: str, report_date: str):
+    """'HH:MM-HH:MM' + 'MM/DD/YYYY' → (start, end) datetimes, or None."""
+    try:
+        start_str, end_str = time_range.split("-")
+        day = datetime.strptime(report_date.strip(), "%m/%d/%Y")
+        start = datetime.strptime(start_str.strip(), "%H:%M")
+        end = datetime.strptime(end_str.strip(), "%H:%M")
+    except ValueError:
+        return None
+
+    start_dt = datetime.combine(day.date(), start.time())
+    end_dt = datetime.combine(day.date(), end.time())
+    if end_dt < start_dt:
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+
 # ================= POINT CALCULATOR =================
 def calculate_points(job_name: str, duration: int, clients: int) -> int:
     job_name = job_name.lower().strip()
@@ -106,47 +452,15 @@ def bonus_from_rank(rank: str) -> float:
 
 
 # ================= MONTHLY LEADERBOARD =================
-def update_leaderboard():
-    records = SHEET.get_all_records()
-    now = datetime.now()
-    current_month = now.month
-    current_year = now.year
-    current_month_name = now.strftime("%b")
-
-    sheet_title = f"Leaderboard - {current_month_name} {current_year}"
-    BANK_RYO = 20000
-
-    ss = GC.open_by_key(SPREADSHEET_ID)
-
-    # Load ranks from Master Log (if exists)
-    rank_by_medic = {}
-    try:
-        master = ss.worksheet("Leaf Master Medical Log")
-        master_records = master.get_all_records()
-        for row in master_records:
-            medic_name = row.get("Medic", "").strip()
-            if medic_name:
-                rank_by_medic[medic_name] = row.get("Rank", "Unranked")
-    except gspread.exceptions.WorksheetNotFound:
-        # No master sheet yet; everyone effectively Unranked
-        rank_by_medic = {}
+LEADERBOARD_HEADER = [
+    "Rank", "Medic", "Raw Points", "Jobs Logged",
+    "Rank Title", "Bonus Multiplier",
+    "Adjusted Points", "Total Pay", "Total Ryo"
+]
 
-    # Create or open the monthly leaderboard sheet
-    try:
-        leaderboard_sheet = ss.worksheet(sheet_title)
-    except gspread.exceptions.WorksheetNotFound:
-        leaderboard_sheet = ss.add_worksheet(
-            title=sheet_title, rows="200", cols="10"
-        )
-        leaderboard_sheet.update([[
-            "Rank", "Medic", "Raw Points", "Jobs Logged",
-            "Rank Title", "Bonus Multiplier",
-            "Adjusted Points", "Total Pay", "Total Ryo"
-        ]])
-
-    points_by_medic = defaultdict(int)
-    jobs_by_medic = defaultdict(int)
 
+def tally_month(records, year: int, month: int, points_by_medic, jobs_by_medic):
+    """Add one batch of raw-log rows for the given month to the running totals."""
     for row in records:
         date_str = str(row.get("Report Date", "")).strip()
         if not date_str:
@@ -157,7 +471,7 @@ def update_leaderboard():
         except ValueError:
             continue
 
-        if d.month == current_month and d.year == current_year:
+        if d.year == year and d.month == month:
             medics_raw = row.get("Medics", "")
             try:
                 points = int(row.get("Points", 0))
@@ -168,11 +482,12 @@ def update_leaderboard():
                 points_by_medic[medic] += points
                 jobs_by_medic[medic] += 1
 
-    if not points_by_medic:
-        leaderboard_sheet.clear()
-        leaderboard_sheet.update([["No data for this month."]])
-        return [], {}
 
+def leaderboard_rows(points_by_medic, jobs_by_medic, rank_by_medic, bank_ryo):
+    """Rank medics by bonus-adjusted points and split the ryo bank by share.
+
+    Returns (sorted (medic, adjusted points) pairs, sheet rows incl. header).
+    """
     # Adjust with rank bonuses (from Master Log Rank)
     adjusted_points = {}
     for medic, raw in points_by_medic.items():
@@ -183,11 +498,7 @@ def update_leaderboard():
     total_adjusted = sum(adjusted_points.values())
     sorted_data = sorted(adjusted_points.items(), key=lambda x: x[1], reverse=True)
 
-    output = [[
-        "Rank", "Medic", "Raw Points", "Jobs Logged",
-        "Rank Title", "Bonus Multiplier",
-        "Adjusted Points", "Total Pay", "Total Ryo"
-    ]]
+    output = [LEADERBOARD_HEADER]
 
     for i, (medic, adj) in enumerate(sorted_data, start=1):
         raw = points_by_medic[medic]
@@ -195,7 +506,7 @@ def update_leaderboard():
         rank_title = rank_by_medic.get(medic, "Unranked")
         mult = bonus_from_rank(rank_title)
         share = adj / total_adjusted if total_adjusted > 0 else 0
-        pay = round(share * BANK_RYO, 2)
+        pay = round(share * bank_ryo, 2)
 
         output.append([
             i,
@@ -206,26 +517,69 @@ def update_leaderboard():
             mult,
             round(adj, 2),
             pay,
-            BANK_RYO if i == 1 else ""
+            bank_ryo if i == 1 else ""
         ])
 
-    leaderboard_sheet.clear()
-    leaderboard_sheet.update(output)
+    return sorted_data, output
+
+
+def update_leaderboard(tenant: Tenant):
+    records = tenant.records()
+    now = datetime.now()
+    current_month = now.month
+    current_year = now.year
+    current_month_name = now.strftime("%b")
+
+    sheet_title = f"Leaderboard - {current_month_name} {current_year}"
+
+    # Load ranks from Master Log (if exists)
+    rank_by_medic = {}
+    try:
+        master_records = tenant.master_records()
+        for row in master_records:
+            medic_name = row.get("Medic", "").strip()
+            if medic_name:
+                rank_by_medic[medic_name] = row.get("Rank", "Unranked")
+    except gspread.exceptions.WorksheetNotFound:
+        # No master sheet yet; everyone effectively Unranked
+        rank_by_medic = {}
+
+    # Create or open the monthly leaderboard sheet
+    try:
+        leaderboard_sheet = tenant.worksheet(sheet_title)
+    except gspread.exceptions.WorksheetNotFound:
+        leaderboard_sheet = tenant.add_worksheet(
+            title=sheet_title, rows="200", cols="10"
+        )
+        tenant.call(leaderboard_sheet.update, [LEADERBOARD_HEADER])
 
-    print(f"✅ Leaderboard updated for {current_month_name} {current_year}")
+    points_by_medic = defaultdict(int)
+    jobs_by_medic = defaultdict(int)
+    tally_month(records, current_year, current_month, points_by_medic, jobs_by_medic)
+
+    if not points_by_medic:
+        tenant.call(leaderboard_sheet.clear)
+        tenant.call(leaderboard_sheet.update, [["No data for this month."]])
+        return [], {}
+
+    sorted_data, output = leaderboard_rows(
+        points_by_medic, jobs_by_medic, rank_by_medic, tenant.bank_ryo
+    )
+
+    tenant.call(leaderboard_sheet.clear)
+    tenant.call(leaderboard_sheet.update, output)
+
+    print(f"✅ [{tenant.name}] Leaderboard updated for {current_month_name} {current_year}")
     return sorted_data, jobs_by_medic
 
-def update_single_leaderboard(year: int, month: int):
-    ss = GC.open_by_key(SPREADSHEET_ID)
-    records = SHEET.get_all_records()
+def update_single_leaderboard(tenant: Tenant, year: int, month: int):
+    records = tenant.records()
 
     sheet_title = f"Leaderboard - {datetime(year, month, 1).strftime('%b')} {year}"
-    BANK_RYO = 20000
 
     # Load ranks
     try:
-        master = ss.worksheet("Leaf Master Medical Log")
-        master_records = master.get_all_records()
+        master_records = tenant.master_records()
         rank_by_medic = {
             row.get("Medic", ""): row.get("Rank", "Unranked")
             for row in master_records
@@ -235,83 +589,35 @@ def update_single_leaderboard(year: int, month: int):
 
     # Create or open the sheet
     try:
-        leaderboard_sheet = ss.worksheet(sheet_title)
+        leaderboard_sheet = tenant.worksheet(sheet_title)
     except gspread.exceptions.WorksheetNotFound:
-        leaderboard_sheet = ss.add_worksheet(sheet_title, rows=200, cols=10)
-    leaderboard_sheet.update([[
-        "Rank", "Medic", "Raw Points", "Jobs Logged",
-        "Rank Title", "Bonus Multiplier",
-        "Adjusted Points", "Total Pay", "Total Ryo"
-    ]])
+        leaderboard_sheet = tenant.add_worksheet(sheet_title, rows=200, cols=10)
+    tenant.call(leaderboard_sheet.update, [LEADERBOARD_HEADER])
 
 
     # Collect raw data for this month
     points_by_medic = defaultdict(int)
     jobs_by_medic = defaultdict(int)
-
-    for row in records:
-        date_str = str(row.get("Report Date", "")).strip()
-        if not date_str:
-            continue
-
-        try:
-            d = datetime.strptime(date_str, "%m/%d/%Y")
-        except ValueError:
-            continue
-
-        if d.year == year and d.month == month:
-            medics = [m.strip() for m in row.get("Medics", "").split(",") if m.strip()]
-            pts = int(row.get("Points", 0))
-
-            for medic in medics:
-                points_by_medic[medic] += pts
-                jobs_by_medic[medic] += 1
+    tally_month(records, year, month, points_by_medic, jobs_by_medic)
 
     # If empty month
     if not points_by_medic:
-        leaderboard_sheet.update([["No data for this month."]])
+        tenant.call(leaderboard_sheet.update, [["No data for this month."]])
         return
 
-    adjusted = {}
-    for medic, raw_pts in points_by_medic.items():
-        rank = rank_by_medic.get(medic, "Unranked")
-        mult = bonus_from_rank(rank)
-        adjusted[medic] = raw_pts * mult
-
-    total_adj = sum(adjusted.values())
-
-    output = [[
-        "Rank", "Medic", "Raw Points", "Jobs Logged",
-        "Rank Title", "Bonus Multiplier",
-        "Adjusted Points", "Total Pay", "Total Ryo"
-    ]]
-
-    sorted_medics = sorted(adjusted.items(), key=lambda x: x[1], reverse=True)
-
-    for i, (medic, adj_pts) in enumerate(sorted_medics, start=1):
-        raw_pts = points_by_medic[medic]
-        jobs = jobs_by_medic[medic]
-        rank_title = rank_by_medic.get(medic, "Unranked")
-        mult = bonus_from_rank(rank_title)
-        share = adj_pts / total_adj if total_adj else 0
-        pay = round(share * BANK_RYO, 2)
-
-        output.append([
-            i, medic, raw_pts, jobs, rank_title, mult,
-            round(adj_pts, 2), pay,
-            BANK_RYO if i == 1 else ""
-        ])
+    _, output = leaderboard_rows(
+        points_by_medic, jobs_by_medic, rank_by_medic, tenant.bank_ryo
+    )
 
-    leaderboard_sheet.clear()
-    leaderboard_sheet.update(output)
+    tenant.call(leaderboard_sheet.clear)
+    tenant.call(leaderboard_sheet.update, output)
 
-    print(f"Updated leaderboard: {sheet_title}")
+    print(f"[{tenant.name}] Updated leaderboard: {sheet_title}")
 
 
-def update_all_leaderboards():
+def update_all_leaderboards(tenant: Tenant):
     """Rebuild leaderboard sheets for every month found in the raw log."""
-    ss = GC.open_by_key(SPREADSHEET_ID)
-    records = SHEET.get_all_records()
+    records = tenant.records()
 
     # Find all months with data
     months = set()
@@ -337,28 +643,27 @@ def update_all_leaderboards():
 
         # Temporarily override datetime.now() behavior
         print(f"📅 Updating leaderboard for: {title}")
-        update_single_leaderboard(year, month)
+        update_single_leaderboard(tenant, year, month)
 
 
 # ================= MASTER LOG (LIFETIME) =================
-def update_master_log():
-    ss = GC.open_by_key(SPREADSHEET_ID)
-
+def update_master_log(tenant: Tenant):
     # Ensure master sheet exists & capture existing ranks
     try:
-        master = ss.worksheet("Leaf Master Medical Log")
-        existing_records = master.get_all_records()
+        master = tenant.worksheet(tenant.master_title)
+        # Always fresh: ranks are set by hand here and must not be overwritten
+        existing_records = tenant.master_records(fresh=True)
         existing_ranks = {
             row.get("Medic", "").strip(): row.get("Rank", "Unranked")
             for row in existing_records
             if row.get("Medic", "").strip()
         }
     except gspread.exceptions.WorksheetNotFound:
-        master = ss.add_worksheet(
-            title="Leaf Master Medical Log", rows="300", cols="20"
+        master = tenant.add_worksheet(
+            title=tenant.master_title, rows="300", cols="20"
         )
         existing_ranks = {}
-        master.update([[
+        tenant.call(master.update, [[
             "Medic", "Rank", "Total Jobs", "Total Raw Points",
             "Total Adjusted Points", "Total Hours", "Raid",
             "LMPF", "Healing", "Rev/Spar",
@@ -366,7 +671,7 @@ def update_master_log():
             "Mission", "Hosted Event"
         ]])
 
-    records = SHEET.get_all_records()
+    records = tenant.records()
 
     raw_points = defaultdict(int)
     jobs = defaultdict(int)
@@ -445,9 +750,239 @@ def update_master_log():
             round(hours_by_type[medic]["Hosted Event"], 2),
         ])
 
-    master.clear()
-    master.update(output)
-    print("✅ Leaf Master Medical Log updated")
+    # Overwrite in place, then clear only leftover rows, so readers (exports,
+    # other processes) never see the master log empty mid-rebuild
+    tenant.call(master.update, output)
+    last_col = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, len(output[0])))
+    tenant.call(master.batch_clear, [f"A{len(output) + 1}:{last_col}"])
+    # Keep the rebuilt rows as this tenant's master state; saves a re-read
+    tenant.set_master_records([dict(zip(output[0], row)) for row in output[1:]])
+    print(f"✅ {tenant.master_title} updated")
+
+
+def rebuild_all_logs(tenant: Tenant):
+    """Forced rebuild (/updatelogs): drop caches, then master log and every leaderboard."""
+    # Caches may be stale if the sheet was edited by hand
+    tenant.invalidate()
+    update_master_log(tenant)
+    update_all_leaderboards(tenant)
+
+
+# ================= EXPORT =================
+EXPORT_CHUNK_ROWS = 500
+EXPORT_KINDS = ("raw", "leaderboard", "master")
+EXPORT_FORMATS = ("csv", "parquet")
+LEADERBOARD_TYPES = [
+    "int64", "string", "int64", "int64",
+    "string", "float64",
+    "float64", "float64", "int64"
+]
+
+
+def parse_month(text: str):
+    """'MM/YYYY' or 'YYYY-MM' → (year, month)."""
+    for fmt in ("%m/%Y", "%Y-%m"):
+        try:
+            d = datetime.strptime(text.strip(), fmt)
+            return d.year, d.month
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid month '{text}', use MM/YYYY")
+
+
+def parse_report_date(text: str):
+    """'MM/DD/YYYY' or 'YYYY-MM-DD' → date."""
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text.strip(), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date '{text}', use MM/DD/YYYY")
+
+
+def hyperlink_url(formula: str):
+    """URL inside a =HYPERLINK("url", "label") formula, or None."""
+    match = re.match(r'\s*=\s*HYPERLINK\(\s*"([^"]*)"', str(formula), re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def iter_sheet_chunks(tenant: Tenant, worksheet, header, chunk_rows: int = EXPORT_CHUNK_ROWS,
+                      link_columns=()):
+    """Yield a worksheet's rows as lists of dicts, `chunk_rows` rows per request.
+
+    Unlike get_all_records() only one chunk is ever held in memory. Cells in
+    `link_columns` hold =HYPERLINK formulas whose rendered value is just the
+    label, so those columns are re-read as formulas and replaced by the URL.
+    """
+    link_cols = [header.index(col) for col in link_columns if col in header]
+    start = 2
+    while start <= worksheet.row_count:
+        end = min(start + chunk_rows - 1, worksheet.row_count)
+        values = tenant.call(worksheet.get, f"{start}:{end}")
+        for col in link_cols:
+            first = gspread.utils.rowcol_to_a1(start, col + 1)
+            last = gspread.utils.rowcol_to_a1(end, col + 1)
+            formulas = tenant.call(
+                worksheet.get, f"{first}:{last}",
+                value_render_option=gspread.utils.ValueRenderOption.formula,
+            )
+            for row, cells in zip(values, formulas):
+                url = hyperlink_url(cells[0]) if cells else None
+                if url and col < len(row):
+                    row[col] = url
+        rows = [
+            dict(zip(header, row + [""] * (len(header) - len(row))))
+            for row in values
+            if any(str(v).strip() for v in row)
+        ]
+        if rows:
+            yield rows
+        start = end + 1
+
+
+def row_matches(row: dict, medic_field: str, medic=None, start=None, end=None) -> bool:
+    """Apply the export's medic-name and report-date filters to one row."""
+    if medic:
+        names = [m.strip().lower() for m in str(row.get(medic_field, "")).split(",")]
+        if not any(medic.lower() in name for name in names):
+            return False
+    if start or end:
+        try:
+            d = datetime.strptime(str(row.get("Report Date", "")).strip(), "%m/%d/%Y").date()
+        except ValueError:
+            return False
+        if (start and d < start) or (end and d > end):
+            return False
+    return True
+
+
+class CsvExport:
+    def __init__(self, path: str, header):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExport:
+    """Writes one Parquet row group per chunk. Needs the optional pyarrow package."""
+
+    def __init__(self, path: str, header, types=None):
+        """`types` are pyarrow type names per column (default: all strings)."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (`pip install pyarrow`)")
+
+        self.pa = pa
+        self.header = list(header)
+        self.types = [getattr(pa, t)() for t in types or ["string"] * len(self.header)]
+        self.schema = pa.schema(list(zip(self.header, self.types)))
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = []
+        for i, typ in enumerate(self.types):
+            if typ == self.pa.string():
+                columns.append([str(row[i]) for row in rows])
+            else:
+                columns.append([None if row[i] == "" else row[i] for row in rows])
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_export(path: str, fmt: str, header, types=None):
+    if fmt == "parquet":
+        return ParquetExport(path, header, types)
+    return CsvExport(path, header)
+
+
+def export_data(tenant: Tenant, kind: str, path: str, fmt: str = "csv",
+                month=None, start=None, end=None, medic=None,
+                chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Stream the raw log, a month's leaderboard or the master log to a file.
+
+    `month` is (year, month) for leaderboards; `start`/`end` are dates that
+    bound the raw log's Report Date; `medic` keeps rows naming that medic.
+    Returns the number of data rows written.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export '{kind}', choose from {', '.join(EXPORT_KINDS)}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', choose from {', '.join(EXPORT_FORMATS)}")
+    # Only the raw log has a Report Date; a leaderboard's period is its month
+    if (start or end) and kind != "raw":
+        raise ValueError("Start/end dates only apply to raw exports; use month for leaderboards")
+    if month and kind != "leaderboard":
+        raise ValueError("Month only applies to leaderboard exports")
+
+    # Fresh worksheet handle → current row_count even if reports were appended
+    if kind == "master":
+        worksheet = tenant.call(tenant.spreadsheet.worksheet, tenant.master_title)
+    else:
+        worksheet = tenant.call(tenant.spreadsheet.get_worksheet, 0)
+    header = tenant.call(worksheet.row_values, 1)
+    written = 0
+
+    if kind == "leaderboard":
+        year, mon = month or (datetime.now().year, datetime.now().month)
+        points_by_medic = defaultdict(int)
+        jobs_by_medic = defaultdict(int)
+        for chunk in iter_sheet_chunks(tenant, worksheet, header, chunk_rows):
+            tally_month(chunk, year, mon, points_by_medic, jobs_by_medic)
+
+        # Read ranks on a fresh handle; exports never touch the tenant's caches
+        try:
+            master = tenant.call(tenant.spreadsheet.worksheet, tenant.master_title)
+            rank_by_medic = {
+                str(row.get("Medic", "")).strip(): row.get("Rank", "Unranked")
+                for row in tenant.call(master.get_all_records)
+            }
+        except gspread.exceptions.WorksheetNotFound:
+            rank_by_medic = {}
+
+        # Pay shares depend on every medic, so filter only after ranking
+        _, output = leaderboard_rows(
+            points_by_medic, jobs_by_medic, rank_by_medic, tenant.bank_ryo
+        )
+        rows = output[1:]
+        if medic:
+            rows = [row for row in rows if medic.lower() in row[1].lower()]
+
+        out = open_export(path, fmt, LEADERBOARD_HEADER, LEADERBOARD_TYPES)
+        try:
+            for i in range(0, len(rows), chunk_rows):
+                out.write(rows[i:i + chunk_rows])
+        finally:
+            out.close()
+        return len(rows)
+
+    medic_field = "Medics" if kind == "raw" else "Medic"
+    # Export the report URL rather than the "View Report" label
+    link_columns = ("Message Link",) if kind == "raw" else ()
+    out = open_export(path, fmt, header)
+    try:
+        for chunk in iter_sheet_chunks(tenant, worksheet, header, chunk_rows, link_columns):
+            rows = [
+                [row.get(col, "") for col in header]
+                for row in chunk
+                if row_matches(row, medic_field, medic, start, end)
+            ]
+            out.write(rows)
+            written += len(rows)
+    finally:
+        out.close()
+    return written
 
 
 # ================= DISCORD BOT =================
@@ -460,24 +995,31 @@ tree = discord.app_commands.CommandTree(bot)
 
 # ================= Update ALL leaderboards =================
 @tree.command(name="updatelogs", description="Force update ALL leaderboard sheets and the master log.")
-@discord.app_commands.guilds(discord.Object(id=GUILD_ID))
+@discord.app_commands.guilds(*TENANT_GUILDS)
 async def update_logs(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
+    tenant = tenant_for(interaction)
+    if tenant is None:
+        await interaction.followup.send("⚠️ This server is not set up as a medical division.")
+        return
     try:
-        update_master_log()
-        update_all_leaderboards()
+        await run_for_tenant(tenant, rebuild_all_logs)
         await interaction.followup.send("✅ All logs and leaderboards updated!")
     except Exception as e:
         await interaction.followup.send(f"⚠️ Error: {e}")
 
 # ---------- /leaderboard (monthly) ----------
 @tree.command(name="leaderboard", description="Show this month's medic leaderboard")
-@discord.app_commands.guilds(discord.Object(id=GUILD_ID))
+@discord.app_commands.guilds(*TENANT_GUILDS)
 async def leaderboard_cmd(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
+    tenant = tenant_for(interaction)
+    if tenant is None:
+        await interaction.followup.send("⚠️ This server is not set up as a medical division.")
+        return
 
     try:
-        sorted_data, jobs_by_medic = update_leaderboard()
+        sorted_data, jobs_by_medic = await run_for_tenant(tenant, update_leaderboard)
 
         if not sorted_data:
             await interaction.followup.send("📋 No medic data found for this month.")
@@ -506,13 +1048,16 @@ async def leaderboard_cmd(interaction: discord.Interaction):
 # ---------- /medicstats (lifetime) ----------
 @tree.command(name="medicstats", description="View lifetime stats for a specific medic")
 @discord.app_commands.describe(name="The medic's name")
-@discord.app_commands.guilds(discord.Object(id=GUILD_ID))
+@discord.app_commands.guilds(*TENANT_GUILDS)
 async def medicstats(interaction: discord.Interaction, name: str):
     await interaction.response.defer(ephemeral=False)
+    tenant = tenant_for(interaction)
+    if tenant is None:
+        await interaction.followup.send("⚠️ This server is not set up as a medical division.")
+        return
 
     try:
-        master = GC.open_by_key(SPREADSHEET_ID).worksheet("Leaf Master Medical Log")
-        records = master.get_all_records()
+        records = await run_for_tenant(tenant, Tenant.master_records)
 
         if not records:
             await interaction.followup.send("⚠️ No lifetime data found.")
@@ -580,10 +1125,81 @@ async def medicstats(interaction: discord.Interaction, name: str):
         await interaction.followup.send(f"⚠️ Error: {e}")
 
 
+# ---------- /export (admin) ----------
+@tree.command(name="export", description="Export raw logs, a leaderboard or the master log as a file")
+@discord.app_commands.describe(
+    data="What to export",
+    file_format="File type (default csv)",
+    month="Leaderboard month, MM/YYYY (blank = this month)",
+    start="Only reports on/after this date (MM/DD/YYYY)",
+    end="Only reports on/before this date (MM/DD/YYYY)",
+    medic="Only rows for this medic",
+)
+@discord.app_commands.default_permissions(administrator=True)
+@discord.app_commands.guilds(*TENANT_GUILDS)
+async def export_cmd(
+    interaction: discord.Interaction,
+    data: Literal["raw", "leaderboard", "master"],
+    file_format: Literal["csv", "parquet"] = "csv",
+    month: str = None,
+    start: str = None,
+    end: str = None,
+    medic: str = None,
+):
+    await interaction.response.defer(ephemeral=True)
+    tenant = tenant_for(interaction)
+    if tenant is None:
+        await interaction.followup.send("⚠️ This server is not set up as a medical division.")
+        return
+
+    try:
+        period = parse_month(month) if month else None
+        start_date = parse_report_date(start) if start else None
+        end_date = parse_report_date(end) if end else None
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = f"{data}-export.{file_format}"
+            path = os.path.join(tmp, filename)
+            # Rebuilds never clear the raw log, so raw/leaderboard dumps skip the
+            # tenant lock and reports keep flowing; the master log is rewritten
+            # by every report, so its (small) export waits for a quiet moment
+            run = run_for_tenant if data == "master" else run_sheets
+            count = await run(
+                export_data, tenant, data, path, file_format,
+                period, start_date, end_date, medic,
+            )
+
+            size = os.path.getsize(path)
+            limit = interaction.guild.filesize_limit
+            if size > limit:
+                await interaction.followup.send(
+                    f"⚠️ Export is {size / 1024 / 1024:.1f} MB, over this server's "
+                    f"{limit / 1024 / 1024:.0f} MB upload limit. Narrow it with "
+                    "filters, use parquet, or run `python medic_bot.py export`.",
+                    ephemeral=True,
+                )
+                return
+
+            await interaction.followup.send(
+                f"📄 Exported {count} rows.",
+                file=discord.File(path, filename=filename),
+                ephemeral=True,
+            )
+
+    except Exception as e:
+        await interaction.followup.send(f"⚠️ Error: {e}", ephemeral=True)
+
+
 # ---------- /report ----------
 @tree.command(name="report", description="Submit a medic report")
-@discord.app_commands.guilds(discord.Object(id=GUILD_ID))
+@discord.app_commands.guilds(*TENANT_GUILDS)
 async def report(interaction: discord.Interaction):
+    tenant = tenant_for(interaction)
+    if tenant is None:
+        await interaction.response.send_message(
+            "⚠️ This server is not set up as a medical division.", ephemeral=True
+        )
+        return
 
     class JobSelect(discord.ui.Select):
         def __init__(self):
@@ -629,11 +1245,12 @@ async def report(interaction: discord.Interaction):
                     return None
 
                 async def on_submit(self, modal_interaction: discord.Interaction):
+                    claimed = None
                     try:
                         await modal_interaction.response.defer(ephemeral=True)
 
                         # Load normalization table and normalize medic names
-                        name_map = load_medic_normalization()
+                        name_map = await run_for_tenant(tenant, load_medic_normalization)
                         medic_list = [
                             normalize_medic_name(m.strip(), name_map)
                             for m in re.split(r",|\band\b", self.medics.value)
@@ -673,6 +1290,19 @@ async def report(interaction: discord.Interaction):
                         points = calculate_points(job_type, duration, len(clients_list))
                         desc = self.description.value.strip()
 
+                        # Catch repeats / overlapping jobs before anything is posted
+                        index = await run_for_tenant(tenant, Tenant.report_index)
+                        conflict = index.conflict(medic_list, job_type, start_dt, end_dt)
+                        if conflict:
+                            await modal_interaction.followup.send(
+                                f"⚠️ Possible duplicate: {conflict} Report not logged.",
+                                ephemeral=True,
+                            )
+                            return
+                        # Claim it now so a simultaneous submission of the same job is caught too
+                        claimed = (medic_list, job_type, start_dt, end_dt)
+                        index.add(*claimed)
+
                         embed = discord.Embed(
                             title=f"Medic Report — {job_type}",
                             description=desc,
@@ -694,25 +1324,28 @@ async def report(interaction: discord.Interaction):
                         link = f"https://discord.com/channels/{modal_interaction.guild.id}/{modal_interaction.channel.id}/{msg.id}"
                         hyperlink = f'=HYPERLINK("{link}", "View Report")'
 
-                        SHEET.append_row(
-                            [
-                                datetime.now().strftime("%m/%d/%Y %H:%M"),
-                                ", ".join(medic_list),
-                                job_type,
-                                f"{duration} min",
-                                points,
-                                len(clients_list),
-                                ", ".join(clients_list),
-                                desc,
-                                date_obj.strftime("%m/%d/%Y"),
-                                hyperlink,
-                            ],
-                            value_input_option="USER_ENTERED",
+                        await run_for_tenant(
+                            tenant,
+                            Tenant.append_report,
+                            {
+                                "Timestamp": datetime.now().strftime("%m/%d/%Y %H:%M"),
+                                "Medics": ", ".join(medic_list),
+                                "Job Name": job_type,
+                                "Duration": f"{duration} min",
+                                "Points": points,
+                                "Clients": len(clients_list),
+                                "Participant Names": ", ".join(clients_list),
+                                "Description": desc,
+                                "Report Date": date_obj.strftime("%m/%d/%Y"),
+                                "Message Link": hyperlink,
+                                "Time Range": format_time_range(start_dt, end_dt),
+                            },
                         )
+                        claimed = None
 
                         # Update monthly leaderboard & master log
-                        update_master_log()
-                        update_leaderboard()
+                        await run_for_tenant(tenant, update_master_log)
+                        await run_for_tenant(tenant, update_leaderboard)
 
                         await modal_interaction.followup.send(
                             "✅ Report logged and all sheets updated!",
@@ -720,6 +1353,9 @@ async def report(interaction: discord.Interaction):
                         )
 
                     except Exception as e:
+                        if claimed:
+                            # Report never reached the sheet → free its slot
+                            index.remove(*claimed)
                         await modal_interaction.followup.send(
                             f"⚠️ Error: {e}",
                             ephemeral=True,
@@ -741,9 +1377,55 @@ async def report(interaction: discord.Interaction):
 
 @bot.event
 async def on_ready():
-    synced = await tree.sync(guild=discord.Object(id=GUILD_ID))
-    print(f"Synced {len(synced)} commands to guild {GUILD_ID}")
+    for tenant in TENANTS.values():
+        synced = await tree.sync(guild=discord.Object(id=tenant.guild_id))
+        print(f"Synced {len(synced)} commands to guild {tenant.guild_id} ({tenant.name})")
     print(f"Logged in as {bot.user}")
 
 
-bot.run(DISCORD_TOKEN)
\ No newline at end of file
+# ================= ENTRY POINT =================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Medic report bot")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("run", help="Run the Discord bot (default)")
+
+    exp = sub.add_parser("export", help="Export sheet data to CSV or Parquet")
+    exp.add_argument("data", choices=EXPORT_KINDS)
+    exp.add_argument("--out", required=True, help="Output file path")
+    exp.add_argument("--format", dest="file_format", choices=EXPORT_FORMATS,
+                     help="Defaults to the --out file extension, else csv")
+    exp.add_argument("--guild", type=int, help="Division guild ID (needed with several tenants)")
+    exp.add_argument("--month", type=parse_month, help="Leaderboard month, MM/YYYY")
+    exp.add_argument("--start", type=parse_report_date, help="Reports on/after MM/DD/YYYY")
+    exp.add_argument("--end", type=parse_report_date, help="Reports on/before MM/DD/YYYY")
+    exp.add_argument("--medic", help="Only rows for this medic")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        if args.guild is not None:
+            tenant = TENANTS.get(args.guild)
+        elif len(TENANTS) == 1:
+            tenant = next(iter(TENANTS.values()))
+        else:
+            parser.error("--guild is required when several divisions are configured")
+        if tenant is None:
+            parser.error(f"No division configured for guild {args.guild}")
+
+        file_format = args.file_format or (
+            "parquet" if args.out.endswith(".parquet") else "csv"
+        )
+        try:
+            count = export_data(
+                tenant, args.data, args.out, file_format,
+                args.month, args.start, args.end, args.medic,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Exported {count} rows to {args.out}")
+    else:
+        bot.run(DISCORD_TOKEN)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file